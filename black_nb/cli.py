@@ -14,8 +14,13 @@
 # all copies or substantial portions of the Software.
 
 
+import json
+import multiprocessing
+import multiprocessing.pool
+import time
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Pattern, Tuple
+from types import TracebackType
+from typing import Any, Dict, List, Optional, Pattern, Set, Tuple, Type
 
 import black
 from black.files import find_project_root
@@ -131,6 +136,44 @@ TARGET_VERSIONS = {
     is_flag=True,
     help="Clear cell output as part of formatting.",
 )
+@click.option(
+    "--max-output-bytes",
+    type=click.IntRange(min=0),
+    help=(
+        "Drop the largest outputs of any code cell whose outputs exceed this "
+        "many bytes, until the remaining outputs fit."
+    ),
+)
+@click.option(
+    "--max-notebook-bytes",
+    type=click.IntRange(min=0),
+    help=(
+        "Clear the outputs of the code cells with the largest outputs until "
+        "the notebook's outputs fit in this many bytes."
+    ),
+)
+@click.option(
+    "--max-cell-bytes",
+    type=click.IntRange(min=0),
+    help="Skip reformatting code cells whose source exceeds this many bytes.",
+)
+@click.option(
+    "--cell-timeout",
+    type=click.FloatRange(min=0),
+    help=(
+        "Skip reformatting code cells that take longer than this many "
+        "seconds.  Cells are reformatted in a separate process which is "
+        "killed when the timeout expires."
+    ),
+)
+@click.option(
+    "--notebook-timeout",
+    type=click.FloatRange(min=0),
+    help=(
+        "Skip reformatting the remaining code cells of a notebook once this "
+        "many seconds have been spent on it."
+    ),
+)
 @click.argument(
     "src",
     nargs=-1,
@@ -169,6 +212,11 @@ def cli(
     quiet: bool,
     verbose: bool,
     clear_output: bool,
+    max_output_bytes: Optional[int],
+    max_notebook_bytes: Optional[int],
+    max_cell_bytes: Optional[int],
+    cell_timeout: Optional[float],
+    notebook_timeout: Optional[float],
     src: Tuple[str, ...],
     config: Optional[str],
 ) -> None:
@@ -213,16 +261,23 @@ def cli(
         ctx,
     )
 
-    for source in sources:
-        reformat_one(
-            src=source,
-            write_back=write_back,
-            mode=mode,
-            clear_output=clear_output,
-            report=report,
-            quiet=quiet,
-            verbose=verbose,
-        )
+    with CellWorker() as worker:
+        for source in sources:
+            reformat_one(
+                src=source,
+                write_back=write_back,
+                mode=mode,
+                clear_output=clear_output,
+                max_output_bytes=max_output_bytes,
+                max_notebook_bytes=max_notebook_bytes,
+                max_cell_bytes=max_cell_bytes,
+                cell_timeout=cell_timeout,
+                notebook_timeout=notebook_timeout,
+                worker=worker,
+                report=report,
+                quiet=quiet,
+                verbose=verbose,
+            )
 
     if verbose or not quiet:
         black.out("All done! ✨ 🍰 ✨")
@@ -235,6 +290,12 @@ def reformat_one(
     write_back: black.WriteBack,
     mode: black.FileMode,
     clear_output: bool,
+    max_output_bytes: Optional[int],
+    max_notebook_bytes: Optional[int],
+    max_cell_bytes: Optional[int],
+    cell_timeout: Optional[float],
+    notebook_timeout: Optional[float],
+    worker: "CellWorker",
     report: black.Report,
     quiet: bool,
     verbose: bool,
@@ -259,15 +320,31 @@ def reformat_one(
                 write_back=write_back,
                 mode=mode,
                 clear_output=clear_output,
+                max_output_bytes=max_output_bytes,
+                max_notebook_bytes=max_notebook_bytes,
+                max_cell_bytes=max_cell_bytes,
+                cell_timeout=cell_timeout,
+                notebook_timeout=notebook_timeout,
+                worker=worker,
                 sub_report=sub_report,
             )
-            if sub_report.change_count or sub_report.output_change_count:
+            if (
+                sub_report.change_count
+                or sub_report.output_change_count
+                or sub_report.output_truncated_count
+            ):
                 changed = black.Changed.YES
-        if (
-            write_back is black.WriteBack.YES
-            and changed is not black.Changed.CACHED
-        ) or (
-            write_back is black.WriteBack.CHECK and changed is black.Changed.NO
+        # Cells skipped for exceeding their budget haven't been checked, so
+        # the file mustn't be cached as formatted.
+        if not sub_report.skip_count and (
+            (
+                write_back is black.WriteBack.YES
+                and changed is not black.Changed.CACHED
+            )
+            or (
+                write_back is black.WriteBack.CHECK
+                and changed is black.Changed.NO
+            )
         ):
             black.write_cache(cache, [src], mode)
         report.done(src, changed)
@@ -283,10 +360,17 @@ def format_file_in_place(
     mode: black.FileMode,
     clear_output: bool,
     sub_report: "SubReport",
+    max_output_bytes: Optional[int] = None,
+    max_notebook_bytes: Optional[int] = None,
+    max_cell_bytes: Optional[int] = None,
+    cell_timeout: Optional[float] = None,
+    notebook_timeout: Optional[float] = None,
+    worker: Optional["CellWorker"] = None,
 ) -> "SubReport":
     """
     Format file under `src` path. Return True if changed.
     If `write_back` is YES, write reformatted code to the file.
+    A `worker` is required to enforce `cell_timeout` and `notebook_timeout`.
     """
     try:
         src_contents = nbformat.read(
@@ -298,16 +382,37 @@ def format_file_in_place(
     except AttributeError:
         raise black.InvalidInput("No cells")
 
+    deadline = None
+    if notebook_timeout is not None:
+        if worker is not None:
+            worker.start()
+        deadline = time.monotonic() + notebook_timeout
+
     dst_cells: List[Dict[Any, Any]] = []
+    truncated: Set[int] = set()
     for cell in src_contents["cells"]:
         if cell["cell_type"] == "code":
+            timeout = cell_timeout
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                timeout = (
+                    remaining if timeout is None else min(timeout, remaining)
+                )
             try:
-                cell["source"] = format_cell_source(cell["source"], mode=mode)
+                cell["source"] = guard_cell_source(
+                    cell["source"],
+                    mode=mode,
+                    max_bytes=max_cell_bytes,
+                    timeout=timeout,
+                    worker=worker,
+                )
                 sub_report.done(black.Changed.YES)
             except black.NothingChanged:
                 sub_report.done(black.Changed.NO)
             except black.InvalidInput:
                 sub_report.failed()
+            except CellSkipped:
+                sub_report.skipped()
             if clear_output:
                 try:
                     (
@@ -319,7 +424,19 @@ def format_file_in_place(
                     sub_report.done_output(black.Changed.YES)
                 except black.NothingChanged:
                     sub_report.done_output(black.Changed.NO)
+            elif max_output_bytes is not None:
+                try:
+                    cell["outputs"] = truncate_cell_outputs(
+                        cell["outputs"], max_output_bytes
+                    )
+                    truncated.add(len(dst_cells))
+                except black.NothingChanged:
+                    pass
         dst_cells.append(cell)
+    if not clear_output and max_notebook_bytes is not None:
+        truncated |= strip_notebook_outputs(dst_cells, max_notebook_bytes)
+    for _ in truncated:
+        sub_report.truncated_output()
     src_contents["cells"] = dst_cells
 
     if write_back is black.WriteBack.YES:
@@ -336,6 +453,150 @@ def clear_cell_outputs(
     return [], None
 
 
+def output_size(output: Dict[Any, Any]) -> int:
+    """Return the size in bytes of a cell output serialised as JSON."""
+    return len(json.dumps(output, ensure_ascii=False).encode("utf-8"))
+
+
+def truncate_cell_outputs(
+    src_outputs: List[Dict[Any, Any]], max_bytes: int
+) -> List[Dict[Any, Any]]:
+    """
+    Drop the largest outputs of a cell until the rest fit in `max_bytes`.
+    The order of the remaining outputs is preserved.
+    """
+    sizes = [output_size(output) for output in src_outputs]
+    total = sum(sizes)
+    if total <= max_bytes:
+        raise black.NothingChanged
+    dropped = set()
+    for index in sorted(range(len(sizes)), key=lambda i: -sizes[i]):
+        if total <= max_bytes:
+            break
+        dropped.add(index)
+        total -= sizes[index]
+    return [output for i, output in enumerate(src_outputs) if i not in dropped]
+
+
+def strip_notebook_outputs(
+    cells: List[Dict[Any, Any]], max_bytes: int
+) -> Set[int]:
+    """
+    Clear the outputs of the code cells with the largest outputs, in place,
+    until the outputs of all `cells` fit in `max_bytes`.
+    Return the indices of the cells that were cleared.
+    """
+    sizes = {
+        index: sum(output_size(output) for output in cell["outputs"])
+        for index, cell in enumerate(cells)
+        if cell["cell_type"] == "code"
+    }
+    total = sum(sizes.values())
+    stripped = set()
+    for index in sorted(sizes, key=lambda i: -sizes[i]):
+        if total <= max_bytes:
+            break
+        cells[index]["outputs"] = []
+        stripped.add(index)
+        total -= sizes[index]
+    return stripped
+
+
+class CellSkipped(Exception):
+    """Raised when a cell exceeds its size or time budget."""
+
+
+def warm_up() -> None:
+    """
+    Import black and load its grammar, so that a new process is ready to
+    reformat cells.
+    """
+    black.format_str("pass\n", mode=black.FileMode())
+
+
+class CellWorker:
+    """
+    Reformats cells in a child process that can be killed once a cell
+    exceeds its time budget. The process is only started when first needed
+    and is replaced after being killed.
+    """
+
+    def __init__(self) -> None:
+        self._pool: Optional[multiprocessing.pool.Pool] = None
+
+    def format_cell_source(
+        self, src_contents: str, *, mode: black.FileMode, timeout: float
+    ) -> black.FileContent:
+        """
+        Call :func:`format_cell_source` in the child process.
+        Raise :class:`CellSkipped` if it doesn't return within `timeout`
+        seconds.
+        """
+        if timeout <= 0:
+            raise CellSkipped
+        pool = self.start()
+        result = pool.apply_async(
+            format_cell_source, (src_contents,), {"mode": mode}
+        )
+        try:
+            return result.get(timeout)
+        except multiprocessing.TimeoutError:
+            self.close()
+            raise CellSkipped from None
+
+    def start(self) -> multiprocessing.pool.Pool:
+        """
+        Start the child process if it isn't running, and wait until it is
+        ready so that its startup isn't charged to a cell's time budget.
+        """
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(processes=1)
+            self._pool.apply(warm_up)
+        return self._pool
+
+    def close(self) -> None:
+        """
+        Kill the child process, if any.
+        """
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self) -> "CellWorker":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+
+def guard_cell_source(
+    src_contents: str,
+    *,
+    mode: black.FileMode,
+    max_bytes: Optional[int] = None,
+    timeout: Optional[float] = None,
+    worker: Optional[CellWorker] = None,
+) -> black.FileContent:
+    """
+    Reformat contents of cell with :func:`format_cell_source`, raising
+    :class:`CellSkipped` instead if the source is larger than `max_bytes`
+    or reformatting takes longer than `timeout` seconds.
+    """
+    if max_bytes is not None and len(src_contents.encode("utf-8")) > max_bytes:
+        raise CellSkipped
+    if timeout is None:
+        return format_cell_source(src_contents, mode=mode)
+    if worker is None:
+        raise ValueError("A CellWorker is required to enforce a timeout.")
+    return worker.format_cell_source(src_contents, mode=mode, timeout=timeout)
+
+
 def format_cell_source(
     src_contents: str, *, mode: black.FileMode
 ) -> black.FileContent:
@@ -442,8 +703,10 @@ class SubReport:
     change_count: int = 0
     same_count: int = 0
     failure_count: int = 0
+    skip_count: int = 0
     output_change_count: int = 0
     output_same_count: int = 0
+    output_truncated_count: int = 0
 
     def done(self, changed: black.Changed) -> None:
         """
@@ -463,6 +726,19 @@ class SubReport:
         else:
             self.output_same_count += 1
 
+    def skipped(self) -> None:
+        """
+        Increment the counter for cells skipped for exceeding their budget.
+        """
+        self.skip_count += 1
+
+    def truncated_output(self) -> None:
+        """
+        Increment the counter for cells whose outputs were truncated to fit
+        the size budget.
+        """
+        self.output_truncated_count += 1
+
     def failed(self) -> None:
         """
         Increment the counter for failed reformatting.
@@ -477,12 +753,16 @@ class SubReport:
             reformatted = "would be reformatted"
             unchanged = "would be left unchanged"
             failed = "would fail to reformat"
+            skipped = "would be skipped"
             cleared = "would be cleared"
+            truncated = "would be truncated"
         else:
             reformatted = "reformatted"
             unchanged = "left unchanged"
             failed = "failed to reformat"
+            skipped = "skipped"
             cleared = "cleared"
+            truncated = "truncated"
         report = []
         if self.change_count:
             s = "s" if self.change_count > 1 else ""
@@ -499,6 +779,13 @@ class SubReport:
             report.append(
                 click.style(f"{self.failure_count} cell{s} {failed}", fg="red")
             )
+        if self.skip_count:
+            s = "s" if self.skip_count > 1 else ""
+            report.append(
+                click.style(
+                    f"{self.skip_count} cell{s} {skipped}", fg="yellow"
+                )
+            )
         if self.output_change_count:
             s = "s" if self.change_count > 1 else ""
             report.append(
@@ -510,6 +797,15 @@ class SubReport:
         if self.output_same_count:
             s = "s" if self.same_count > 1 else ""
             report.append(f"{self.output_same_count} output{s} {unchanged}")
+        if self.output_truncated_count:
+            s = "s'" if self.output_truncated_count > 1 else "'s"
+            report.append(
+                click.style(
+                    f"{self.output_truncated_count} cell{s} outputs "
+                    f"{truncated}",
+                    bold=True,
+                )
+            )
         return ", ".join(report) + "."
 
 
@@ -1,10 +1,12 @@
 import shutil
+import time
 from pathlib import Path
 
 import nbformat
 import pytest
 from click.testing import CliRunner
 
+import black_nb.cli
 from black_nb.cli import cli
 
 THIS_FILE = Path(__file__)
@@ -53,6 +55,68 @@ def test_clear_output(tmp_path):
     assert cleared.exit_code == 0
 
 
+@pytest.mark.parametrize(
+    "option", ["--max-output-bytes", "--max-notebook-bytes"]
+)
+def test_output_budget(tmp_path, option):
+    src_dir = THIS_DIR / "data" / "output_budget_tests"
+    dst_dir = tmp_path / "output_budget_tests"
+    shutil.copytree(src_dir, dst_dir)
+
+    oversized = CliRunner().invoke(
+        cli, ["--check", option, "1000", str(dst_dir)]
+    )
+    assert oversized.exit_code == 1
+    assert "1 cell's outputs would be truncated" in oversized.output
+
+    truncating = CliRunner().invoke(cli, [option, "1000", str(dst_dir)])
+    assert truncating.exit_code == 0
+    assert "1 cell's outputs truncated" in truncating.output
+
+    notebook = nbformat.read(
+        str(dst_dir / "large_outputs.ipynb"), as_version=nbformat.NO_CONVERT
+    )
+    assert notebook["cells"][0]["outputs"] == []
+    assert notebook["cells"][1]["outputs"][0]["text"] == "small\n"
+
+    truncated = CliRunner().invoke(
+        cli, ["--check", option, "1000", str(dst_dir)]
+    )
+    assert truncated.exit_code == 0
+
+
+def slow_format_cell_source(src_contents, *, mode):
+    time.sleep(60)
+
+
+def test_max_cell_bytes(tmp_path):
+    src_dir = THIS_DIR / "data" / "formatting_tests"
+    dst_dir = tmp_path / "formatting_tests"
+    shutil.copytree(src_dir, dst_dir)
+
+    skipped = CliRunner().invoke(
+        cli, ["--check", "--max-cell-bytes", "1", str(dst_dir)]
+    )
+    assert skipped.exit_code == 0
+    assert "cells would be skipped" in skipped.output
+
+
+@pytest.mark.parametrize("option", ["--cell-timeout", "--notebook-timeout"])
+def test_timeout(tmp_path, monkeypatch, option):
+    src_dir = THIS_DIR / "data" / "formatting_tests"
+    dst_dir = tmp_path / "formatting_tests"
+    shutil.copytree(src_dir, dst_dir)
+    monkeypatch.setattr(
+        black_nb.cli, "format_cell_source", slow_format_cell_source
+    )
+
+    start = time.monotonic()
+    skipped = CliRunner().invoke(cli, ["--check", option, "0.5", str(dst_dir)])
+    assert time.monotonic() - start < 30
+    assert skipped.exit_code == 0
+    assert "cells would be skipped" in skipped.output
+
+
 def test_invalid_input(tmp_path):
     src_dir = THIS_DIR / "data" / "invalid_input_tests"
     dst_dir = tmp_path / "invalid_input_tests"